@@ -1,40 +1,14 @@
 import dash
-from dash import dcc, html
-import plotly.express as px
-import pandas as pd
-import requests
+from dash import Patch, ctx, dcc, html, no_update
 from dash.dependencies import Input, Output
 
+from census.core import (
+    CACHE_TIMEOUT, INDICATORS, cache, empty_figure, get_vital_stats_data, line_figure
+)
+
 app = dash.Dash(__name__)
 server = app.server
-
-API_URL = "http://api.worldbank.org/v2/country/{}/indicator/{}?format=json"
-
-def fetch_vital_stats_data(indicator_code, country="world"):
-    response = requests.get(API_URL.format(country, indicator_code))
-    try:
-        data = response.json()
-    except ValueError:
-        print("Invalid JSON response")
-        return pd.DataFrame()
-
-    if len(data) < 2 or not isinstance(data[1], list):
-        print(f"No data available for {indicator_code} in {country}")
-        return pd.DataFrame()
-    
-    data = data[1]
-    df = pd.DataFrame(data)
-    
-    # Check for 'country' field being a dictionary
-    if 'country' in df.columns and isinstance(df['country'][0], dict):
-        df['Country'] = df['country'].apply(lambda x: x.get('value', 'Unknown'))
-    else:
-        df.rename(columns={'country': 'Country'}, inplace=True)
-
-    df = df[['Country', 'date', 'value']]
-    df.rename(columns={'date': 'Year', 'value': indicator_code}, inplace=True)
-    df['Year'] = df['Year'].astype(int)  # Convert year to integer for consistency
-    return df
+cache.init_app(server)
 
 app.layout = html.Div([
     html.H1("Real-Time Global Population and Vital Statistics Dashboard"),
@@ -49,58 +23,47 @@ app.layout = html.Div([
         value='world',
         style={'width': '50%'}
     ),
-    dcc.Graph(id='population-graph'),
-    dcc.Graph(id='birth-rate-graph'),
-    dcc.Graph(id='death-rate-graph'),
-    dcc.Graph(id='life-expectancy-graph'),
-    dcc.Graph(id='fertility-rate-graph'),
-    dcc.Graph(id='infant-mortality-graph'),
-    dcc.Graph(id='gdp-graph'),
+    *[dcc.Graph(id=graph_id) for graph_id, _, _ in INDICATORS],
+    # Hourly refresh. Ticks read through the shared cache like dropdown changes,
+    # so upstream load doesn't grow with open tabs; since a tab's timer and an
+    # entry's TTL aren't aligned, a graph may lag the API by up to ~2 hours.
     dcc.Interval(
         id='interval-component',
-        interval=60000,
+        interval=CACHE_TIMEOUT * 1000,
         n_intervals=0
     )
 ])
 
-@app.callback(
-    [Output('population-graph', 'figure'),
-     Output('birth-rate-graph', 'figure'),
-     Output('death-rate-graph', 'figure'),
-     Output('life-expectancy-graph', 'figure'),
-     Output('fertility-rate-graph', 'figure'),
-     Output('infant-mortality-graph', 'figure'),
-     Output('gdp-graph', 'figure')],
-    [Input('country-dropdown', 'value'),
-     Input('interval-component', 'n_intervals')]
-)
-def update_graphs(selected_country, n_intervals):
-    population_data = fetch_vital_stats_data("SP.POP.TOTL", selected_country)
-    birth_rate_data = fetch_vital_stats_data("SP.DYN.BIRT.IN", selected_country)
-    death_rate_data = fetch_vital_stats_data("SP.DYN.DEAT.IN", selected_country)
-    life_expectancy_data = fetch_vital_stats_data("SP.DYN.LE00.IN", selected_country)
-    fertility_rate_data = fetch_vital_stats_data("SP.DYN.TFRT.IN", selected_country)
-    infant_mortality_data = fetch_vital_stats_data("SH.DYN.MORT", selected_country)
-    gdp_per_capita_data = fetch_vital_stats_data("NY.GDP.PCAP.CD", selected_country)
-
-    # Initialize data with population_data
-    data = population_data
-    for df in [birth_rate_data, death_rate_data, life_expectancy_data, fertility_rate_data, infant_mortality_data, gdp_per_capita_data]:
-        if not df.empty:
-            try:
-                data = pd.merge(data, df, on=['Country', 'Year'], how='outer')
-            except Exception as e:
-                print(f"Error merging data: {e}")
-
-    population_fig = px.line(data, x='Year', y='SP.POP.TOTL', title=f'Population of {selected_country} Over Time')
-    birth_rate_fig = px.line(data, x='Year', y='SP.DYN.BIRT.IN', title=f'Birth Rate in {selected_country} Over Time')
-    death_rate_fig = px.line(data, x='Year', y='SP.DYN.DEAT.IN', title=f'Death Rate in {selected_country} Over Time')
-    life_expectancy_fig = px.line(data, x='Year', y='SP.DYN.LE00.IN', title=f'Life Expectancy in {selected_country} Over Time')
-    fertility_rate_fig = px.line(data, x='Year', y='SP.DYN.TFRT.IN', title=f'Fertility Rate in {selected_country} Over Time')
-    infant_mortality_fig = px.line(data, x='Year', y='SH.DYN.MORT', title=f'Infant Mortality Rate in {selected_country} Over Time')
-    gdp_fig = px.line(data, x='Year', y='NY.GDP.PCAP.CD', title=f'GDP per Capita in {selected_country} Over Time')
+def register_graph_callback(graph_id, indicator_code, title):
+    # Each graph gets its own callback so Dash can run them in parallel and a
+    # slow indicator only holds up its own graph
+    @app.callback(
+        Output(graph_id, 'figure'),
+        [Input('country-dropdown', 'value'),
+         Input('interval-component', 'n_intervals')]
+    )
+    def update_graph(selected_country, n_intervals):
+        interval_tick = ctx.triggered_id == 'interval-component'
+        data = get_vital_stats_data(indicator_code, selected_country)
+        figure_title = title.format(selected_country)
+        if data.empty:
+            if interval_tick:
+                # Keep whatever the graph is showing rather than blanking it
+                return no_update
+            return empty_figure(indicator_code, figure_title)
+        figure = line_figure(data, indicator_code, figure_title)
+        if interval_tick:
+            # Only send the trace data and title instead of the whole figure.
+            # The title is included because the graph may still show another
+            # country if a slow dropdown response was dropped in favour of this tick.
+            patch = Patch()
+            patch['data'] = figure['data']
+            patch['layout']['title']['text'] = figure_title
+            return patch
+        return figure
 
-    return population_fig, birth_rate_fig, death_rate_fig, life_expectancy_fig, fertility_rate_fig, infant_mortality_fig, gdp_fig
+for graph_id, indicator_code, title in INDICATORS:
+    register_graph_callback(graph_id, indicator_code, title)
 
 if __name__ == '__main__':
     app.run_server(debug=True)
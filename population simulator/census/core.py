@@ -0,0 +1,180 @@
+import asyncio
+import datetime
+import json
+import threading
+from array import array
+
+import aiohttp
+import ijson
+import numpy as np
+import plotly.graph_objects as go
+import pandas as pd
+from flask_caching import Cache
+
+# World Bank series change at most a few times a year, so fetched frames are
+# kept for an hour. The filesystem backend is shared by all gunicorn workers.
+# The app binds it to its Flask server with cache.init_app().
+CACHE_TIMEOUT = 3600
+cache = Cache(config={
+    'CACHE_TYPE': 'FileSystemCache',
+    'CACHE_DIR': '/tmp/wb',
+    'CACHE_DEFAULT_TIMEOUT': CACHE_TIMEOUT
+})
+
+# (graph id, World Bank indicator code, figure title)
+INDICATORS = [
+    ('population-graph', 'SP.POP.TOTL', 'Population of {} Over Time'),
+    ('birth-rate-graph', 'SP.DYN.BIRT.IN', 'Birth Rate in {} Over Time'),
+    ('death-rate-graph', 'SP.DYN.DEAT.IN', 'Death Rate in {} Over Time'),
+    ('life-expectancy-graph', 'SP.DYN.LE00.IN', 'Life Expectancy in {} Over Time'),
+    ('fertility-rate-graph', 'SP.DYN.TFRT.IN', 'Fertility Rate in {} Over Time'),
+    ('infant-mortality-graph', 'SH.DYN.MORT', 'Infant Mortality Rate in {} Over Time'),
+    ('gdp-graph', 'NY.GDP.PCAP.CD', 'GDP per Capita in {} Over Time')
+]
+
+# Axis layout for each indicator's graph, built once instead of letting
+# plotly.express infer it from the data on every call
+LAYOUTS = {
+    indicator_code: go.Layout(xaxis_title='Year', yaxis_title=indicator_code)
+    for _, indicator_code, _ in INDICATORS
+}
+
+API_URL = "http://api.worldbank.org/v2/country/{}/indicator/{}"
+FIRST_YEAR = 1960
+# The API pages at 50 rows by default; ask for the whole series in one page
+PER_PAGE = 200
+MAX_RETRIES = 2
+RETRY_BACKOFF = 0.3  # seconds, doubled on every retry
+
+# A single event loop lives for the whole process so one aiohttp session, and
+# its pool of keep-alive connections, is reused by every callback
+LOOP = asyncio.new_event_loop()
+threading.Thread(target=LOOP.run_forever, daemon=True).start()
+
+async def create_session():
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=20),
+        timeout=aiohttp.ClientTimeout(total=10),
+        # The JSON compresses ~10x; ask for it explicitly rather than relying on
+        # library defaults surviving proxies. aiohttp decompresses the stream.
+        headers={'Accept-Encoding': 'gzip, deflate'}
+    )
+
+SESSION = asyncio.run_coroutine_threadsafe(create_session(), LOOP).result()
+
+async def read_records(stream):
+    # Walk the parser events in a single pass, keeping only the year and value
+    # of each record instead of materializing the whole response. Every record
+    # of a single-country query names the same country, so that is read once.
+    # Returns None when the response holds no record list.
+    country_name = None
+    # Typed buffers rather than lists of Python objects, so NumPy can read
+    # them without converting each item
+    years, values = array('i'), array('d')
+    has_records = False
+    year = record_value = None
+    async for prefix, event, value in ijson.parse_async(stream, use_float=True):
+        if prefix == 'item' and event == 'start_array':
+            has_records = True
+        elif prefix == 'item.item.country.value' and country_name is None:
+            country_name = value
+        elif prefix == 'item.item.date':
+            year = value
+        elif prefix == 'item.item.value':
+            record_value = value
+        elif prefix == 'item.item' and event == 'end_map':
+            # A record without a usable year can't be plotted; drop it whole
+            # so years and values stay aligned
+            if year is not None and str(year).isdigit():
+                years.append(int(year))
+                values.append(np.nan if record_value is None else record_value)
+            year = record_value = None
+    if not has_records:
+        return None
+    return country_name or 'Unknown', years, values
+
+async def fetch_records(indicator_code, country="world"):
+    # Returns the parsed (country, years, values), or None if there is no data
+    url = API_URL.format(country, indicator_code)
+    params = {
+        'format': 'json',
+        'per_page': PER_PAGE,
+        'date': f"{FIRST_YEAR}:{datetime.date.today().year}"
+    }
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            async with SESSION.get(url, params=params) as response:
+                # Error pages (e.g. a 502 from the gateway) go through the
+                # retry loop instead of failing as invalid JSON
+                response.raise_for_status()
+                records = await read_records(response.content)
+            break
+        except ijson.JSONError:
+            print("Invalid JSON response")
+            return None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if attempt == MAX_RETRIES:
+                print(f"Request failed for {indicator_code} in {country}: {e}")
+                return None
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+
+    if records is None:
+        print(f"No data available for {indicator_code} in {country}")
+    return records
+
+def fetch_vital_stats_data(indicator_code, country="world"):
+    # Only the network I/O and parsing run on the shared event loop. The frame
+    # is built here on the calling callback thread, so the per-graph callbacks
+    # don't queue up behind each other's pandas work on the loop thread.
+    records = asyncio.run_coroutine_threadsafe(
+        fetch_records(indicator_code, country), LOOP
+    ).result()
+    if records is None:
+        return pd.DataFrame()
+
+    country_name, years, values = records
+    # Years are downcast to the smallest integer dtype that holds them. Values
+    # stay float64: float32 would leak rounding noise (18.123 -> 18.1229991...)
+    # into the figure JSON and hover text.
+    return pd.DataFrame({
+        'Country': country_name,  # broadcast to every row
+        'Year': pd.to_numeric(np.frombuffer(years, dtype=np.intc), downcast='integer'),
+        indicator_code: np.frombuffer(values, dtype=np.float64)
+    })
+
+def get_vital_stats_data(indicator_code, country="world"):
+    # The cache is checked here rather than inside the coroutine so its
+    # blocking I/O stays off the shared event loop
+    key = f"vital_stats/{country}/{indicator_code}"
+    df = cache.get(key)
+    if df is None:
+        df = fetch_vital_stats_data(indicator_code, country)
+        if not df.empty:  # don't cache failed fetches
+            cache.set(key, df, timeout=CACHE_TIMEOUT)
+    return df
+
+def line_figure(data, indicator_code, title):
+    # Building a figure and serializing it is the bulk of the callback's
+    # Python time, so the finished figure JSON is cached against a hash of the
+    # series it plots and rebuilt only when that data actually changes
+    series = data[['Year', indicator_code]]
+    data_hash = int(pd.util.hash_pandas_object(series, index=False).sum())
+    key = f"figure/{indicator_code}/{title}/{data_hash}"
+    figure = cache.get(key)
+    if figure is None:
+        # WebGL trace: the browser draws it on the GPU instead of as SVG
+        fig = go.Figure(
+            go.Scattergl(x=series['Year'].to_numpy(), y=series[indicator_code].to_numpy(), mode='lines'),
+            layout=LAYOUTS[indicator_code]
+        )
+        fig.layout.title.text = title
+        figure = json.loads(fig.to_json())
+        cache.set(key, figure, timeout=CACHE_TIMEOUT)
+    return figure
+
+def empty_figure(indicator_code, title):
+    # Same layout line_figure uses, so patching trace data into it later gives
+    # the same figure a full render would
+    fig = go.Figure(layout=LAYOUTS[indicator_code])
+    fig.layout.title.text = title
+    return json.loads(fig.to_json())